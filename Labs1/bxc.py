@@ -8,6 +8,13 @@ import os
 import re
 import sys
 
+# --------------------------------------------------------------------
+try:
+    import orjson
+    _loads = orjson.loads
+except ImportError:
+    _loads = json.loads
+
 
 # --------------------------------------------------------------------
 class Expression:
@@ -15,19 +22,19 @@ class Expression:
 
 
 # --------------------------------------------------------------------
-@dc.dataclass
+@dc.dataclass(slots=True, frozen=True)
 class VarExpression(Expression):
     name: str
 
 
 # --------------------------------------------------------------------
-@dc.dataclass
+@dc.dataclass(slots=True, frozen=True)
 class IntExpression(Expression):
     value: int
 
 
 # --------------------------------------------------------------------
-@dc.dataclass
+@dc.dataclass(slots=True, frozen=True)
 class OpAppExpression(Expression):
     operator: str
     arguments: list[Expression]
@@ -39,20 +46,20 @@ class Statement:
 
 
 # --------------------------------------------------------------------
-@dc.dataclass
+@dc.dataclass(slots=True, frozen=True)
 class VarDeclStatement(Statement):
     name: str
 
 
 # --------------------------------------------------------------------
-@dc.dataclass
+@dc.dataclass(slots=True, frozen=True)
 class AssignStatement(Statement):
     lhs: str
     rhs: Expression
 
 
 # --------------------------------------------------------------------
-@dc.dataclass
+@dc.dataclass(slots=True, frozen=True)
 class PrintStatement(Statement):
     value: Expression
 
@@ -63,131 +70,168 @@ class InvalidBXJSon(Exception):
 
 
 # --------------------------------------------------------------------
-def check_shallow_schema(data, schema):
-    if not isinstance(data, dict):
-        raise InvalidBXJSon
+def compile_schema(schema):
+    # A schema is static, so instead of interpreting it per node we
+    # generate (once, at import time) a straight-line validator
+    # specialized for it and compile that with exec.
+    lines = [
+        'def _validate(data):',
+        '    if not isinstance(data, dict):',
+        '        raise InvalidBXJSon',
+    ]
+
+    scope = {'InvalidBXJSon': InvalidBXJSon, 'parse_tag': parse_tag}
 
     for name, etype in schema:
-        if name not in data:
-            raise InvalidBXJSon
+        lines += [
+            f'    if {name!r} not in data:',
+            '        raise InvalidBXJSon',
+        ]
 
         if etype is None:
             continue
 
-        value = data[name]
+        lines.append(f'    value = data[{name!r}]')
 
         if isinstance(etype, str):
-            if not isinstance(value, (list, tuple)):
-                raise InvalidBXJSon
-            if len(value) != 2:
-                raise InvalidBXJSon
-            if not isinstance(value[0], str):
-                raise InvalidBXJSon
-            if parse_tag(value[0])[0] != etype:
-                raise InvalidBXJSon
-
-            continue
-
-        if not isinstance(value, etype):
-            raise InvalidBXJSon
-
-
-# --------------------------------------------------------------------
-def parse_tag(tag: str) -> tuple[str, str]:
-    if (m := re.search(r'^<(\w+)(?::(\w+))?>$', tag)) is None:
-        raise InvalidBXJSon
-    return m.group(1), m.group(2)
-
-
-# --------------------------------------------------------------------
-def parse_name(name) -> str:
-    try:
-        return name[1]['value']
-    except IndexError:
-        raise InvalidBXJSon
+            lines += [
+                '    if not isinstance(value, (list, tuple)):',
+                '        raise InvalidBXJSon',
+                '    if len(value) != 2:',
+                '        raise InvalidBXJSon',
+                '    if not isinstance(value[0], str):',
+                '        raise InvalidBXJSon',
+                f'    if parse_tag(value[0])[0] != {etype!r}:',
+                '        raise InvalidBXJSon',
+            ]
+        else:
+            scope[etype.__name__] = etype
+            lines += [
+                f'    if not isinstance(value, {etype.__name__}):',
+                '        raise InvalidBXJSon',
+            ]
+
+    namespace = {}
+    exec('\n'.join(lines), scope, namespace)
+
+    return namespace['_validate']
 
 
 # --------------------------------------------------------------------
-JSON_EXPRESSIONS = dict()
+_TAG_RE = re.compile(r'^<(\w+)(?::(\w+))?>$')
 
+_TAG_CACHE: dict[str, tuple[str, str]] = {
+    '<name>': ('name', None),
+    '<expression:var>': ('expression', 'var'),
+    '<expression:int>': ('expression', 'int'),
+    '<expression:uniop>': ('expression', 'uniop'),
+    '<expression:binop>': ('expression', 'binop'),
+    '<statement:vardecl>': ('statement', 'vardecl'),
+    '<statement:assign>': ('statement', 'assign'),
+    '<statement:eval>': ('statement', 'eval'),
+}
 
-# --------------------------------------------------------------------
-def expression_of_json(tag, data):
-    clazz, tag = parse_tag(tag)
 
-    if clazz != 'expression':
-        raise InvalidBXJSon()
+def parse_tag(tag: str) -> tuple[str, str]:
+    try:
+        return _TAG_CACHE[tag]
+    except KeyError:
+        pass
 
-    if tag not in JSON_EXPRESSIONS:
+    if (m := _TAG_RE.search(tag)) is None:
         raise InvalidBXJSon
 
-    check_shallow_schema(data, JSON_EXPRESSIONS[tag][0])
-
-    return JSON_EXPRESSIONS[tag][1](data)
-
+    _TAG_CACHE[tag] = parsed = (m.group(1), m.group(2))
 
-# --------------------------------------------------------------------
-EXPRESSION_VAR_SCHEMA = [
-    ('name', 'name'),
-]
-
-
-def expression_var_of_json(data):
-    return VarExpression(name=parse_name(data['name']))
+    return parsed
 
 
-JSON_EXPRESSIONS['var'] = (EXPRESSION_VAR_SCHEMA, expression_var_of_json)
-
 # --------------------------------------------------------------------
-EXPRESSION_INT_SCHEMA = [
-    ('value', int),
-]
-
-
-def expression_int_of_json(data):
-    return IntExpression(value=data['value'])
-
-
-JSON_EXPRESSIONS['int'] = (EXPRESSION_INT_SCHEMA, expression_int_of_json)
+# When set (--trusted), the JSON is assumed to be machine-generated and
+# well-formed: the shallow schema checks below are skipped entirely.
+_TRUSTED = False
 
 # --------------------------------------------------------------------
-EXPRESSION_UNIOP_SCHEMA = [
-    ('operator', 'name'),
-    ('argument', 'expression'),
-]
-
+EXPRESSION_SCHEMAS = {
+    'var': [
+        ('name', 'name'),
+    ],
+    'int': [
+        ('value', int),
+    ],
+    'uniop': [
+        ('operator', 'name'),
+        ('argument', 'expression'),
+    ],
+    'binop': [
+        ('operator', 'name'),
+        ('left', 'expression'),
+        ('right', 'expression'),
+    ],
+}
+
+EXPRESSION_VALIDATORS = {
+    tag: compile_schema(schema)
+    for tag, schema in EXPRESSION_SCHEMAS.items()
+}
 
-def expression_uniop_of_json(data):
-    return OpAppExpression(
-        operator=parse_name(data['operator']),
-        arguments=[expression_of_json(*data['argument'])],
-    )
-
-
-JSON_EXPRESSIONS['uniop'] = (EXPRESSION_UNIOP_SCHEMA, expression_uniop_of_json)
 
 # --------------------------------------------------------------------
-EXPRESSION_BINOP_SCHEMA = [
-    ('operator', 'name'),
-    ('left', 'expression'),
-    ('right', 'expression'),
-]
-
+def expression_of_json(tag, data):
+    clazz, tag = parse_tag(tag)
 
-def expression_binop_of_json(data):
-    return OpAppExpression(
-        operator=parse_name(data['operator']),
-        arguments=[
-            expression_of_json(*data['left']),
-            expression_of_json(*data['right']),
-        ],
-    )
+    if clazz != 'expression':
+        raise InvalidBXJSon
 
+    if not _TRUSTED:
+        if tag not in EXPRESSION_VALIDATORS:
+            raise InvalidBXJSon
+        EXPRESSION_VALIDATORS[tag](data)
+
+    match tag:
+        case 'var':
+            return VarExpression(name=data['name'][1]['value'])
+
+        case 'int':
+            return IntExpression(value=data['value'])
+
+        case 'uniop':
+            return OpAppExpression(
+                operator=data['operator'][1]['value'],
+                arguments=[expression_of_json(*data['argument'])],
+            )
+
+        case 'binop':
+            return OpAppExpression(
+                operator=data['operator'][1]['value'],
+                arguments=[
+                    expression_of_json(*data['left']),
+                    expression_of_json(*data['right']),
+                ],
+            )
+
+        case _:
+            raise InvalidBXJSon
 
-JSON_EXPRESSIONS['binop'] = (EXPRESSION_BINOP_SCHEMA, expression_binop_of_json)
 
 # --------------------------------------------------------------------
-JSON_STATEMENTS = dict()
+STATEMENT_SCHEMAS = {
+    'vardecl': [
+        ('name', 'name'),
+    ],
+    'assign': [
+        ('lvalue', 'lvalue'),
+        ('rvalue', 'expression'),
+    ],
+    'eval': [
+        ('expression', 'expression'),
+    ],
+}
+
+STATEMENT_VALIDATORS = {
+    tag: compile_schema(schema)
+    for tag, schema in STATEMENT_SCHEMAS.items()
+}
 
 
 # --------------------------------------------------------------------
@@ -197,69 +241,41 @@ def statement_of_json(tag, data):
     if clazz != 'statement':
         raise InvalidBXJSon
 
-    if tag not in JSON_STATEMENTS:
-        raise InvalidBXJSon
-
-    check_shallow_schema(data, JSON_STATEMENTS[tag][0])
-
-    return JSON_STATEMENTS[tag][1](data)
-
-
-# --------------------------------------------------------------------
-STATEMENT_VARDECL_SCHEMA = [
-    ('name', 'name'),
-]
-
-
-def statement_vardecl_of_json(data):
-    return VarDeclStatement(name=parse_name(data['name']))
-
-
-JSON_STATEMENTS['vardecl'] = (STATEMENT_VARDECL_SCHEMA,
-                              statement_vardecl_of_json)
-
-# --------------------------------------------------------------------
-STATEMENT_VARDECL_SCHEMA = [
-    ('lvalue', 'lvalue'),
-    ('rvalue', 'expression'),
-]
+    if not _TRUSTED:
+        if tag not in STATEMENT_VALIDATORS:
+            raise InvalidBXJSon
+        STATEMENT_VALIDATORS[tag](data)
 
+    match tag:
+        case 'vardecl':
+            return VarDeclStatement(name=data['name'][1]['value'])
 
-def statement_assign_of_json(data):
-    return AssignStatement(
-        lhs=parse_name(data['lvalue'][1]['name']),
-        rhs=expression_of_json(*data['rvalue']),
-    )
+        case 'assign':
+            return AssignStatement(
+                lhs=data['lvalue'][1]['name'][1]['value'],
+                rhs=expression_of_json(*data['rvalue']),
+            )
 
+        case 'eval':
+            expression = data['expression']
 
-JSON_STATEMENTS['assign'] = (STATEMENT_VARDECL_SCHEMA,
-                             statement_assign_of_json)
+            if not _TRUSTED:
+                try:
+                    if expression[0] != '<expression:call>':
+                        raise InvalidBXJSon
 
-# --------------------------------------------------------------------
-STATEMENT_EVAL_SCHEMA = [
-    ('expression', 'expression'),
-]
+                    if expression[1]['target'][1]['value'] != 'print':
+                        raise InvalidBXJSon
 
+                except IndexError:
+                    raise InvalidBXJSon
 
-def statement_eval_of_json(data):
-    expression = data['expression']
+            return PrintStatement(
+                value=expression_of_json(*expression[1]['arguments'][0]), )
 
-    try:
-        if expression[0] != '<expression:call>':
-            raise InvalidBXJSon
-
-        if parse_name(expression[1]['target']) != 'print':
+        case _:
             raise InvalidBXJSon
 
-    except IndexError:
-        raise InvalidBXJSon
-
-    return PrintStatement(
-        value=expression_of_json(*expression[1]['arguments'][0]), )
-
-
-JSON_STATEMENTS['eval'] = (STATEMENT_EVAL_SCHEMA, statement_eval_of_json)
-
 
 # --------------------------------------------------------------------
 def bxprogram_of_json(data):
@@ -273,12 +289,24 @@ def bxprogram_of_json(data):
 
 # --------------------------------------------------------------------
 def _main():
-    if len(sys.argv) - 1 != 1:
-        print(f'Usage: {os.path.basename(sys.argv[0])} [INPUT]')
+    global _TRUSTED
+
+    # expression_of_json recurses per nesting level; the default limit
+    # is too low for machine-generated ASTs.
+    sys.setrecursionlimit(100_000)
+
+    args = sys.argv[1:]
+
+    if '--trusted' in args:
+        _TRUSTED = True
+        args.remove('--trusted')
+
+    if len(args) != 1:
+        print(f'Usage: {os.path.basename(sys.argv[0])} [--trusted] [INPUT]')
         exit(1)
 
-    with open(sys.argv[1], 'r') as stream:
-        data = json.load(stream)
+    with open(args[0], 'rb') as stream:
+        data = _loads(stream.read())
 
     prgm = bxprogram_of_json(data)
 
@@ -4,13 +4,66 @@
 # Mon, 26 Sep 2022 22:34:42 +0200
 
 # --------------------------------------------------------------------
-import json, sys
+import enum, json, sys
+
+# --------------------------------------------------------------------
+try:
+    import orjson
+    _loads = orjson.loads
+except ImportError:
+    _loads = json.loads
+
+# --------------------------------------------------------------------
+class Op(enum.IntEnum):
+    CONST = 0
+    COPY  = 1
+    ADD   = 2
+    SUB   = 3
+    MUL   = 4
+    DIV   = 5
+    MOD   = 6
+    AND   = 7
+    OR    = 8
+    XOR   = 9
+    SHL   = 10
+    SHR   = 11
+    NEG   = 12
+    NOT   = 13
+    PRINT = 14
+
+# The serialized opcode names are the lowercased member names
+OPCODES = {op.name.lower(): op for op in Op}
 
 # --------------------------------------------------------------------
 class CodeEmitter:
+    # Callee-saved registers usable for temporaries.  X0-X2 remain
+    # scratch; caller-saved registers would not survive the bl _printf
+    # in the print sequence.
+    REGISTERS = ('X19', 'X20', 'X21', 'X22', 'X23',
+                 'X24', 'X25', 'X26', 'X27', 'X28')
+
     def __init__(self):
-        self._temps = dict()
-        self._asm   = []
+        self._offsets = []
+        self._nslots  = 0
+        self._regs    = dict()
+        self._asm     = []
+
+    def allocate(self, instrs):
+        # Static allocation: the most referenced temporaries live in a
+        # callee-saved register for the whole program, the rest spill
+        # to stack slots handed out by _temp.
+        counts = dict()
+
+        for instr in instrs:
+            for arg in instr['args']:
+                if isinstance(arg, int):
+                    counts[arg] = counts.get(arg, 0) + 1
+            if instr['result'] is not None:
+                counts[instr['result']] = counts.get(instr['result'], 0) + 1
+
+        ranked = sorted(counts, key=counts.get, reverse=True)
+
+        self._regs = dict(zip(ranked, self.REGISTERS))
 
     def __call__(self, instr):
         opcode = instr['opcode']
@@ -19,33 +72,103 @@ class CodeEmitter:
         if instr['result'] is not None:
             args.append(instr['result'])
 
-        getattr(self, f'_emit_{opcode}')(*args)
+        self._EMITTERS[opcode](self, *args)
 
     def _temp(self, temp):
-        index = self._temps.setdefault(temp, len(self._temps))
-        return f'[SP, #{8*index}]'
-
-    def _get_asm(self, opcode, *args):
-        if not args:
-            return opcode
-        return f'{opcode}\t{", ".join(args)}'
+        # Register-resident temporaries yield the register name; the
+        # formatted stack operand of a spilled one is cached (indexed
+        # directly by the temporary's number) so it is only built once
+        # per distinct temporary, not per reference.
+        operand = self._regs.get(temp)
+        if operand is not None:
+            return operand
+
+        offsets = self._offsets
+        if temp >= len(offsets):
+            offsets.extend([None] * (temp + 1 - len(offsets)))
+
+        operand = offsets[temp]
+        if operand is None:
+            operand = offsets[temp] = f'[SP, #{8*self._nslots}]'
+            self._nslots += 1
+        return operand
+
+    @staticmethod
+    def _in_register(operand):
+        return operand[0] != '['
 
     def _emit(self, opcode, *args):
-        self._asm.append(self._get_asm(opcode, *args))
+        self._asm.append((opcode,) + args)
+
+    def _mov_imm(self, reg, value):
+        # A bare mov only encodes 16-bit immediates (plus their movn
+        # complements and the bitmask patterns); anything wider - a
+        # large literal, or a product the constant folder built - is
+        # materialized 16 bits at a time with movz/movn and movk.
+        if -(1 << 16) <= value < (1 << 16):
+            self._asm.append(('mov', reg, f'#{value}'))
+            return
+
+        chunks = [(value >> shift) & 0xFFFF for shift in (0, 16, 32, 48)]
+
+        if value < 0:
+            skip = 0xFFFF
+            self._asm.append(('movn', reg, f'#{chunks[0] ^ 0xFFFF}'))
+        else:
+            skip = 0x0000
+            self._asm.append(('movz', reg, f'#{chunks[0]}'))
+
+        for index in (1, 2, 3):
+            if chunks[index] != skip:
+                self._asm.append(
+                    ('movk', reg, f'#{chunks[index]}', f'LSL #{16*index}'))
 
     def _emit_const(self, ctt, dst):
-        self._emit('mov', 'X2', f'#{ctt}')
-        self._emit('str', 'X2', self._temp(dst))
+        dst = self._temp(dst)
+
+        if self._in_register(dst):
+            self._mov_imm(dst, int(ctt))
+        else:
+            self._mov_imm('X2', int(ctt))
+            self._asm.append(('str', 'X2', dst))
 
     def _emit_copy(self, src, dst):
-        self._emit('ldr', 'X2', self._temp(src))
-        self._emit('str', 'X2', self._temp(dst))
+        src = self._temp(src)
+        dst = self._temp(dst)
+
+        if self._in_register(src):
+            if self._in_register(dst):
+                self._asm.append(('mov', dst, src))
+            else:
+                self._asm.append(('str', src, dst))
+        elif self._in_register(dst):
+            self._asm.append(('ldr', dst, src))
+        else:
+            self._asm.extend((
+                ('ldr', 'X2', src),
+                ('str', 'X2', dst),
+            ))
+
+    def _load(self, operand, scratch):
+        # Make an operand register-resident, using the given scratch
+        # register when it lives on the stack.
+        if self._in_register(operand):
+            return operand
+        self._asm.append(('ldr', scratch, operand))
+        return scratch
 
     def _emit_alu2(self, opcode, op1, op2, dst):
-        self._emit('ldr', 'X0', self._temp(op1))
-        self._emit('ldr', 'X1', self._temp(op2))
-        self._emit(opcode, 'X2', 'X0', 'X1')
-        self._emit('str', 'X2', self._temp(dst))
+        op1 = self._load(self._temp(op1), 'X0')
+        op2 = self._load(self._temp(op2), 'X1')
+        dst = self._temp(dst)
+
+        if self._in_register(dst):
+            self._asm.append((opcode, dst, op1, op2))
+        else:
+            self._asm.extend((
+                (opcode, 'X2', op1, op2),
+                ('str', 'X2', dst),
+            ))
 
     def _emit_add(self, op1, op2, dst):
         self._emit_alu2('add', op1, op2, dst)
@@ -60,12 +183,22 @@ class CodeEmitter:
         self._emit_alu2('sdiv', op1, op2, dst)
 
     def _emit_mod(self, op1, op2, dst):
-        self._emit('ldr' , 'X0', self._temp(op1))
-        self._emit('ldr' , 'X1', self._temp(op2))
-        self._emit('sdiv', 'X2', 'X0', 'X1')
-        self._emit('mul' , 'X2', 'X2', 'X1')
-        self._emit('sub' , 'X2', 'X0', 'X2')
-        self._emit('str' , 'X2', self._temp(dst))
+        op1 = self._load(self._temp(op1), 'X0')
+        op2 = self._load(self._temp(op2), 'X1')
+        dst = self._temp(dst)
+
+        # The remainder is built in X2: targeting dst directly could
+        # clobber op1/op2 when dst shares their register.
+        self._asm.extend((
+            ('sdiv', 'X2', op1, op2),
+            ('mul' , 'X2', 'X2', op2),
+            ('sub' , 'X2', op1, 'X2'),
+        ))
+
+        if self._in_register(dst):
+            self._asm.append(('mov', dst, 'X2'))
+        else:
+            self._asm.append(('str', 'X2', dst))
 
     def _emit_and(self, op1, op2, dst):
         self._emit_alu2('and', op1, op2, dst)
@@ -82,8 +215,32 @@ class CodeEmitter:
     def _emit_shr(self, op1, op2, dst):
         self._emit_alu2('lsr', op1, op2, dst)
 
+    def _emit_alu1(self, opcode, src, dst):
+        src = self._load(self._temp(src), 'X0')
+        dst = self._temp(dst)
+
+        if self._in_register(dst):
+            self._asm.append((opcode, dst, src))
+        else:
+            self._asm.extend((
+                (opcode, 'X2', src),
+                ('str', 'X2', dst),
+            ))
+
+    def _emit_neg(self, src, dst):
+        self._emit_alu1('neg', src, dst)
+
+    def _emit_not(self, src, dst):
+        self._emit_alu1('mvn', src, dst)
+
     def _emit_print(self, arg):
-        self._emit('ldr' , 'X2', self._temp(arg))
+        arg = self._temp(arg)
+
+        if self._in_register(arg):
+            self._emit('mov', 'X2', arg)
+        else:
+            self._emit('ldr', 'X2', arg)
+
         self._emit('stp' , 'X29', 'X30', '[SP, #-16]!')
         self._emit('str' , 'X2', '[SP, #-16]!')
         self._emit('adrp', 'X0', 'l._dformat@PAGE')
@@ -95,17 +252,81 @@ class CodeEmitter:
     def __str__(self):
         return self.code()
 
+    def _peephole(self, asm):
+        # A load right after a store of the same register to the same
+        # slot is redundant: the register still holds the value.
+        aout = []
+
+        for instr in asm:
+            if (instr[0] == 'ldr' and aout
+                    and aout[-1][0] == 'str'
+                    and aout[-1][1:] == instr[1:]):
+                continue
+            aout.append(instr)
+
+        return aout
+
     def code(self):
-        nvars  = len(self._temps)
+        nvars  = self._nslots
         nvars += nvars & 1
 
-        aout = [
-            self._get_asm('sub', 'SP', 'SP', f'#{8*nvars}')
-        ] + self._asm + [
-            self._get_asm('add', 'SP', 'SP', f'#{8*nvars}')
-        ]
+        # The callee-saved registers holding temporaries are preserved
+        # around the whole body.
+        regs     = list(self._regs.values())
+        prologue = []
+        epilogue = []
+
+        for i in range(0, len(regs), 2):
+            if i + 1 < len(regs):
+                prologue.append(('stp', regs[i], regs[i+1], '[SP, #-16]!'))
+                epilogue.insert(0, ('ldp', regs[i], regs[i+1], '[SP]', '#16'))
+            else:
+                prologue.append(('str', regs[i], '[SP, #-16]!'))
+                epilogue.insert(0, ('ldr', regs[i], '[SP]', '#16'))
+
+        aout = prologue + [
+            ('sub', 'SP', 'SP', f'#{8*nvars}'),
+        ] + self._peephole(self._asm) + [
+            ('add', 'SP', 'SP', f'#{8*nvars}'),
+        ] + epilogue
+
+        # Instructions are kept as (opcode, *args) tuples until this
+        # point; the text is materialized with a single final join.
+        buf = []
+
+        for opcode, *args in aout:
+            buf.append('\t')
+            buf.append(opcode)
+            if args:
+                buf.append('\t')
+                buf.append(args[0])
+                for arg in args[1:]:
+                    buf.append(', ')
+                    buf.append(arg)
+            buf.append('\n')
+
+        return ''.join(buf[:-1])
 
-        return "\n".join(f'\t{x}' for x in aout)
+# --------------------------------------------------------------------
+# Per-opcode dispatch table indexed by Op value, built once at import
+# time: emitting an instruction is a single list indexing.
+CodeEmitter._EMITTERS = [
+    getattr(CodeEmitter, f'_emit_{op.name.lower()}') for op in Op
+]
+
+# --------------------------------------------------------------------
+def _decode_instrs(instrs):
+    # Opcodes arrive as mnemonic strings and temporaries as '%n'
+    # strings; convert both to plain ints once so the emitter only
+    # handles integers from then on.
+    for instr in instrs:
+        instr['opcode'] = OPCODES[instr['opcode']]
+        instr['args'] = [
+            int(a[1:]) if isinstance(a, str) and a.startswith('%') else a
+            for a in instr['args']
+        ]
+        if instr['result'] is not None:
+            instr['result'] = int(instr['result'][1:])
 
 # --------------------------------------------------------------------
 def _main():
@@ -115,12 +336,15 @@ def _main():
 
     filename = sys.argv[1]
 
-    with open(filename) as stream:
-        tac = json.load(stream)
+    with open(filename, 'rb') as stream:
+        tac = _loads(stream.read())
 
     main    = [x for x in tac if x['proc'] == '@main'][0]['body']
     emitter = CodeEmitter()
 
+    _decode_instrs(main)
+    emitter.allocate(main)
+
     for instr in main:
         emitter(instr)
 
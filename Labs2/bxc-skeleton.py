@@ -8,20 +8,25 @@ import abc
 import argparse
 import bisect
 import dataclasses as dc
+import enum
 import json
 import os
-import ply.lex
-import ply.yacc
 import re
 import sys
 import typing as tp
 
+# --------------------------------------------------------------------
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 # ====================================================================
 # Parse tree / Abstract Syntax Tree
 
 
 # --------------------------------------------------------------------
-@dc.dataclass
+@dc.dataclass(slots=True, frozen=True)
 class Name:
     value: str
 
@@ -32,19 +37,19 @@ class Expression:
 
 
 # --------------------------------------------------------------------
-@dc.dataclass
+@dc.dataclass(slots=True, frozen=True)
 class VarExpression(Expression):
     name: Name
 
 
 # --------------------------------------------------------------------
-@dc.dataclass
+@dc.dataclass(slots=True, frozen=True)
 class IntExpression(Expression):
     value: int
 
 
 # --------------------------------------------------------------------
-@dc.dataclass
+@dc.dataclass(slots=True, frozen=True)
 class OpAppExpression(Expression):
     operator: str
     arguments: list[Expression]
@@ -56,21 +61,21 @@ class Statement:
 
 
 # --------------------------------------------------------------------
-@dc.dataclass
+@dc.dataclass(slots=True, frozen=True)
 class VarDeclStatement(Statement):
     name: Name
     init: Expression
 
 
 # --------------------------------------------------------------------
-@dc.dataclass
+@dc.dataclass(slots=True, frozen=True)
 class AssignStatement(Statement):
     lhs: Name
     rhs: Expression
 
 
 # --------------------------------------------------------------------
-@dc.dataclass
+@dc.dataclass(slots=True, frozen=True)
 class PrintStatement(Statement):
     value: Expression
 
@@ -82,155 +87,278 @@ Program = list[Statement]
 # BX lexer definition
 
 
-class Lexer:
-    # FIXME: complete the lexer
-    # FIXME: - add all tokens
-    # FIXME: - add all lexing entries (t_XXX)
-
-    tokens = (  # FIXME (add more tokens)
-        'IDENT',
-        'NUMBER',
-        'PLUS',
-        'LPAREM',
-        'RPAREM',
-        'MINUS',
-        'SEMICOLON',
-        'PRINT',
-        'PIPE',
-        'SLASH',
-        'PERCENTAGE',
-        'AND',
-        'POWER',
-        'TILDA',
-        'EQUAL',
-    )
+# --------------------------------------------------------------------
+@dc.dataclass(slots=True, frozen=True)
+class Token:
+    type: str
+    value: tp.Any
+    line: int
 
-    t_EQUAL = re.escape("=")
-    t_TILDA = re.escape("~")
-    t_LPAREM = re.escape("(")
-    t_POWER = re.escape("^")
-    t_AND = re.escape("&")
-    t_PERCENTAGE = re.escape("%")
-    t_SLASH = re.escape("/")
-    t_PIPE = re.escape("|")
-    t_PRINT = re.escape("print")
-    t_SEMICOLON = re.escape(";")
-    t_PLUS = re.escape('+')
-    t_MINUS = re.escape('-')
-    t_RPAREM = re.escape(')')
+
+# --------------------------------------------------------------------
+class Lexer:
+    # Single-character tokens, dispatched on the raw character
+    SIMPLE = {
+        '=': 'EQUAL',
+        '~': 'TILDA',
+        '(': 'LPAREM',
+        ')': 'RPAREM',
+        '{': 'LBRACE',
+        '}': 'RBRACE',
+        '^': 'POWER',
+        '&': 'AND',
+        '%': 'PERCENTAGE',
+        '/': 'SLASH',
+        '|': 'PIPE',
+        ';': 'SEMICOLON',
+        ':': 'COLON',
+        '+': 'PLUS',
+        '-': 'MINUS',
+        '*': 'STAR',
+    }
 
     reserved = {
-        'print': 'print',
+        'print': 'PRINT',
         'def': 'DEF',
         'int': 'INT',
         'main': 'MAIN',
         'var': 'VAR',
     }
 
-    def __init__(self):
+    # Number literals must fit in a signed 64-bit machine integer
+    MAX_NUMBER = 1 << 63
+
+    _NUMBER = re.compile(r'\d+')
+    _IDENT = re.compile(r'[a-zA-Z_][a-zA-Z0-9_]*')
+
+    def __init__(self, source: str):
+        self.source = source
+        self.pos = 0
+        self.line = 1
         self.nerrors = 0
 
-    # Regular expression + processing for tokens with a semantic value
-    def t_NUMBER(self, t):
-        r'\d+'
-        t.value = int(t.value)
-        return t
-
-    # FIXME: handle keywords
-    def t_IDENT(self, t):
-        r'[a-zA-Z_][a-zA-Z0-9_]*'
-        t.value = str(t.value)
-        t.type = self.reserved.get(t.value, "IDENT")
-        return t
-
-    def t_error(self, t):
-        print(f"illegal character: `{t.value[0]}'", file=sys.stderr)
+    def error(self, message: str):
+        print(message, file=sys.stderr)
         self.nerrors += 1
-        t.lexer.skip(1)
 
-    @classmethod
-    def build(cls, **kw):
-        instance = cls()
-        instance.lexer = ply.lex.lex(instance, **kw)
-        return instance
+    def next_token(self) -> tp.Optional[Token]:
+        source = self.source
+        length = len(source)
+
+        while self.pos < length:
+            c = source[self.pos]
+
+            if c == '\n':
+                self.line += 1
+                self.pos += 1
+                continue
+
+            if c in ' \t\r':
+                self.pos += 1
+                continue
+
+            if c == '/' and source.startswith('//', self.pos):
+                index = source.find('\n', self.pos)
+                self.pos = length if index < 0 else index
+                continue
+
+            if '0' <= c <= '9':
+                m = self._NUMBER.match(source, self.pos)
+                self.pos = m.end()
+                value = int(m.group())
+                if value >= self.MAX_NUMBER:
+                    self.error(f'number literal out of range: {m.group()}')
+                return Token('NUMBER', value, self.line)
+
+            # ASCII test: isalpha() accepts any Unicode letter, which
+            # _IDENT would then fail to match.
+            if 'a' <= c <= 'z' or 'A' <= c <= 'Z' or c == '_':
+                m = self._IDENT.match(source, self.pos)
+                self.pos = m.end()
+                value = m.group()
+                return Token(self.reserved.get(value, 'IDENT'), value,
+                             self.line)
+
+            if (type_ := self.SIMPLE.get(c)) is not None:
+                self.pos += 1
+                return Token(type_, c, self.line)
+
+            if source.startswith('<<', self.pos):
+                self.pos += 2
+                return Token('LSHIFT', '<<', self.line)
+
+            if source.startswith('>>', self.pos):
+                self.pos += 2
+                return Token('RSHIFT', '>>', self.line)
+
+            self.error(f"illegal character: `{c}'")
+            self.pos += 1
+
+        return None
 
 
 # ====================================================================
 # BX parser definition
 
 
+# --------------------------------------------------------------------
+class ParseError(Exception):
+    pass
+
+
+# --------------------------------------------------------------------
 class Parser:
     UNIOP = {
-        '-': 'opposite',
-        '~': 'bitwise-negation',
+        'MINUS': 'opposite',
+        'TILDA': 'bitwise-negation',
     }
 
     BINOP = {
-        '+': 'addition',
-        '-': 'subtraction',
-        '*': 'multiplication',
-        '/': 'division',
-        '%': 'modulus',
-        '>>': 'logical-right-shift',
-        '<<': 'logical-left-shift',
-        '&': 'bitwise-and',
-        '|': 'bitwise-or',
-        '^': 'bitwise-xor',
+        'PLUS': 'addition',
+        'MINUS': 'subtraction',
+        'STAR': 'multiplication',
+        'SLASH': 'division',
+        'PERCENTAGE': 'modulus',
+        'RSHIFT': 'logical-shift-right',
+        'LSHIFT': 'logical-shift-left',
+        'AND': 'bitwise-and',
+        'PIPE': 'bitwise-or',
+        'POWER': 'bitwise-xor',
     }
 
-    tokens = Lexer.tokens
-
-    start = 'prgm'
-
-    precedence = ()  # FIXME: set the correct precedence
-
-    def p_name(self, p):
-        """name : IDENT"""
-        p[0] = Name(value=p[1])
-
-    def p_expression_int(self, p):
-        """expr : NUMBER"""
-        p[0] = IntExpression(value=p[1])
-
-    def p_expression_add(self, p):
-        """expr : expr PLUS  expr"""
+    # Binding power per binary operator, loosest first.  Unary
+    # operators bind tighter than all binary ones.
+    PRECEDENCE = {
+        'PIPE': 10,
+        'POWER': 20,
+        'AND': 30,
+        'LSHIFT': 40,
+        'RSHIFT': 40,
+        'PLUS': 50,
+        'MINUS': 50,
+        'STAR': 60,
+        'SLASH': 60,
+        'PERCENTAGE': 60,
+    }
 
-        p[0] = OpAppExpression(
-            operator=self.BINOP[p[2]],
-            arguments=[p[1], p[3]],
-        )
+    UNIOP_PRECEDENCE = 70
 
-    def p_prgm(self, p):
-        """prgm : """  # FIXME: fix the parser
-        p[0] = None
+    def __init__(self, lexer: Lexer):
+        self.lexer = lexer
+        self.token = lexer.next_token()
 
-    def p_error(self, p):
-        self.lexer.nerrors += 1
+    def _advance(self) -> Token:
+        token, self.token = self.token, self.lexer.next_token()
+        return token
 
-        if p:
-            print(f'syntax error at token {p.value}', file=sys.stderr)
-            self.parser.errok()
-        else:
+    def _error(self):
+        if self.token is None:
             print('syntax error at EOF', file=sys.stderr)
-
-    @classmethod
-    def build(cls):
-        instance = cls()
-        instance.parser = ply.yacc.yacc(module=instance)
-        instance.lexer = Lexer.build()
-        return instance
+        else:
+            print(f'syntax error at token {self.token.value}',
+                  file=sys.stderr)
+        raise ParseError
+
+    def _expect(self, type_: str) -> Token:
+        if self.token is None or self.token.type != type_:
+            self._error()
+        return self._advance()
+
+    def parse_program(self) -> Program:
+        self._expect('DEF')
+        self._expect('MAIN')
+        self._expect('LPAREM')
+        self._expect('RPAREM')
+        self._expect('LBRACE')
+
+        body = []
+        while self.token is not None and self.token.type != 'RBRACE':
+            body.append(self.parse_statement())
+
+        self._expect('RBRACE')
+
+        if self.token is not None:
+            self._error()
+
+        return body
+
+    def parse_statement(self) -> Statement:
+        if self.token.type == 'VAR':
+            self._advance()
+            name = self._expect('IDENT')
+            self._expect('EQUAL')
+            init = self.parse_expression()
+            self._expect('COLON')
+            self._expect('INT')
+            self._expect('SEMICOLON')
+            return VarDeclStatement(name=Name(name.value), init=init)
+
+        if self.token.type == 'PRINT':
+            self._advance()
+            self._expect('LPAREM')
+            value = self.parse_expression()
+            self._expect('RPAREM')
+            self._expect('SEMICOLON')
+            return PrintStatement(value=value)
+
+        if self.token.type == 'IDENT':
+            lhs = self._advance()
+            self._expect('EQUAL')
+            rhs = self.parse_expression()
+            self._expect('SEMICOLON')
+            return AssignStatement(lhs=Name(lhs.value), rhs=rhs)
+
+        self._error()
+
+    def parse_expression(self, level: int = 0) -> Expression:
+        expr = self.parse_atom()
+
+        while (self.token is not None
+               and (prec := self.PRECEDENCE.get(self.token.type, 0)) > level):
+            operator = self._advance()
+            expr = OpAppExpression(
+                operator=self.BINOP[operator.type],
+                arguments=[expr, self.parse_expression(prec)],
+            )
+
+        return expr
+
+    def parse_atom(self) -> Expression:
+        if self.token is None:
+            self._error()
+
+        if self.token.type == 'NUMBER':
+            return IntExpression(value=self._advance().value)
+
+        if self.token.type == 'IDENT':
+            return VarExpression(name=Name(self._advance().value))
+
+        if (operator := self.UNIOP.get(self.token.type)) is not None:
+            self._advance()
+            return OpAppExpression(
+                operator=operator,
+                arguments=[self.parse_expression(self.UNIOP_PRECEDENCE)],
+            )
+
+        if self.token.type == 'LPAREM':
+            self._advance()
+            expr = self.parse_expression()
+            self._expect('RPAREM')
+            return expr
+
+        self._error()
 
     @classmethod
     def parse(cls, program: str):
-        instance = cls.build()
+        lexer = Lexer(program)
+        parser = cls(lexer)
 
-        ast = instance.parser.parse(
-            program,
-            lexer=instance.lexer.lexer,
-            tracking=True,
-        )
+        try:
+            ast = parser.parse_program()
+        except ParseError:
+            return None
 
-        return ast if instance.lexer.nerrors == 0 else None
+        return ast if lexer.nerrors == 0 else None
 
 
 # ====================================================================
@@ -240,11 +368,43 @@ class Parser:
 class SynChecker:
 
     def __init__(self):
-        pass
+        self.nerrors = 0
+
+    def error(self, message: str):
+        print(message, file=sys.stderr)
+        self.nerrors += 1
 
     def for_program(self, prgm: Program):
-        # FIXME: check that `prgm` is syntactical correct
-        pass
+        scope: set[str] = set()
+
+        for stmt in prgm:
+            if isinstance(stmt, VarDeclStatement):
+                self.for_expression(stmt.init, scope)
+                if stmt.name.value in scope:
+                    self.error(f'variable redeclared: {stmt.name.value}')
+                else:
+                    scope.add(stmt.name.value)
+
+            elif isinstance(stmt, AssignStatement):
+                if stmt.lhs.value not in scope:
+                    self.error(f'undeclared variable: {stmt.lhs.value}')
+                self.for_expression(stmt.rhs, scope)
+
+            elif isinstance(stmt, PrintStatement):
+                self.for_expression(stmt.value, scope)
+
+    def for_expression(self, expr: Expression, scope: set):
+        work = [expr]
+
+        while work:
+            node = work.pop()
+
+            if isinstance(node, VarExpression):
+                if node.name.value not in scope:
+                    self.error(f'undeclared variable: {node.name.value}')
+
+            elif isinstance(node, OpAppExpression):
+                work.extend(node.arguments)
 
     @classmethod
     def check(cls, prgm: Program):
@@ -256,35 +416,110 @@ class SynChecker:
 # ====================================================================
 # Three-Address Code
 
+# --------------------------------------------------------------------
+class Op(enum.IntEnum):
+    CONST = 0
+    COPY  = 1
+    ADD   = 2
+    SUB   = 3
+    MUL   = 4
+    DIV   = 5
+    MOD   = 6
+    AND   = 7
+    OR    = 8
+    XOR   = 9
+    SHL   = 10
+    SHR   = 11
+    NEG   = 12
+    NOT   = 13
+    PRINT = 14
+
+
+# Serialized opcode names, indexed by Op value
+MNEMONICS = tuple(op.name.lower() for op in Op)
+
+# --------------------------------------------------------------------
 OPCODES = {
-    'opposite': 'neg',
-    'addition': 'add',
-    'subtraction': 'sub',
-    'multiplication': 'mul',
-    'division': 'div',
-    'modulus': 'mod',
-    'bitwise-negation': 'not',
-    'bitwise-and': 'and',
-    'bitwise-or': 'or',
-    'bitwise-xor': 'xor',
-    'logical-shift-left': 'shl',
-    'logical-shift-right': 'shr',
+    'opposite': Op.NEG,
+    'addition': Op.ADD,
+    'subtraction': Op.SUB,
+    'multiplication': Op.MUL,
+    'division': Op.DIV,
+    'modulus': Op.MOD,
+    'bitwise-negation': Op.NOT,
+    'bitwise-and': Op.AND,
+    'bitwise-or': Op.OR,
+    'bitwise-xor': Op.XOR,
+    'logical-shift-left': Op.SHL,
+    'logical-shift-right': Op.SHR,
+}
+
+# --------------------------------------------------------------------
+_INT64_MASK = (1 << 64) - 1
+
+
+def _s64(value: int) -> int:
+    # Wrap to a signed 64-bit machine integer
+    value &= _INT64_MASK
+    return value - (1 << 64) if value >= (1 << 63) else value
+
+
+def _idiv(a: int, b: int) -> int:
+    # C-style division, truncating towards zero
+    q = abs(a) // abs(b)
+    return -q if (a < 0) != (b < 0) else q
+
+
+# --------------------------------------------------------------------
+# Compile-time evaluation of operator applications, with 64-bit
+# wrap-around.  Entries return None when the result is not defined
+# (division by zero, out-of-range shifts): such nodes are left to the
+# emitted code.
+FOLD = {
+    'opposite':
+        lambda a: _s64(-a),
+    'bitwise-negation':
+        lambda a: _s64(~a),
+    'addition':
+        lambda a, b: _s64(a + b),
+    'subtraction':
+        lambda a, b: _s64(a - b),
+    'multiplication':
+        lambda a, b: _s64(a * b),
+    'division':
+        lambda a, b: _s64(_idiv(a, b)) if b != 0 else None,
+    'modulus':
+        lambda a, b: _s64(a - _idiv(a, b) * b) if b != 0 else None,
+    'bitwise-and':
+        lambda a, b: _s64(a & b),
+    'bitwise-or':
+        lambda a, b: _s64(a | b),
+    'bitwise-xor':
+        lambda a, b: _s64(a ^ b),
+    'logical-shift-left':
+        lambda a, b: _s64(a << b) if 0 <= b < 64 else None,
+    'logical-shift-right':
+        lambda a, b: _s64((a & _INT64_MASK) >> b) if 0 <= b < 64 else None,
 }
 
 
 # --------------------------------------------------------------------
-@dc.dataclass
+# Temporaries are plain ints while lowering; they only become the
+# serialized '%n' form on the way out (see tac_json).
+@dc.dataclass(slots=True, frozen=True)
 class TAC:
-    opcode: str
-    arguments: list[str]
-    result: tp.Optional[str] = None
+    opcode: Op
+    args: list[int | str]
+    result: tp.Optional[int] = None
 
-    def tojson(self):
-        return dict(
-            opcode=self.opcode,
-            args=self.arguments,
-            result=self.result,
-        )
+
+# --------------------------------------------------------------------
+def tac_json(tac: TAC) -> dict:
+    return dict(
+        opcode=MNEMONICS[tac.opcode],
+        args=[f'%{a}' if isinstance(a, int) else a for a in tac.args],
+        result=None if tac.result is None else f'%{tac.result}',
+    )
 
 
 # ====================================================================
@@ -297,6 +532,11 @@ class MM:
         self._counter = -1
         self._tac = []
         self._vars = {}
+        # Temporaries holding a known constant: value -> temp / temp -> value
+        self._consts = {}
+        self._values = {}
+        # Already-computed operator applications: (op, *temps) -> temp
+        self._exprs = {}
 
     tac = property(lambda self: self._tac)
 
@@ -304,17 +544,18 @@ class MM:
     def mm(prgm: Program):
         mm = MM()
         mm.for_program(prgm)
+        mm.prune_dead_consts()
         return mm._tac
 
-    def fresh_temporary(self):
+    def fresh_temporary(self) -> int:
         self._counter += 1
-        return f'%{self._counter}'
+        return self._counter
 
     def push(
         self,
-        opcode: str,
-        *arguments: str,
-        result: tp.Optional[str] = None,
+        opcode: Op,
+        *arguments: int | str,
+        result: tp.Optional[int] = None,
     ):
         self._tac.append(TAC(opcode, list(arguments), result))
 
@@ -323,36 +564,101 @@ class MM:
             self.for_statement(stmt)
 
     def for_statement(self, stmt: Statement):
-        match stmt:
-            case VarDeclStatement(name):
-                self._vars[name.value] = self.fresh_temporary()
-                self.push('const', '0', self._vars[name.value])
+        if isinstance(stmt, VarDeclStatement):
+            temp = self.for_expression(stmt.init)
+            self._vars[stmt.name.value] = self.fresh_temporary()
+            self.push(Op.COPY, temp, result=self._vars[stmt.name.value])
+
+        elif isinstance(stmt, AssignStatement):
+            temp = self.for_expression(stmt.rhs)
+            self.push(Op.COPY, temp, result=self._vars[stmt.lhs.value])
+            self._invalidate(self._vars[stmt.lhs.value])
+
+        elif isinstance(stmt, PrintStatement):
+            temp = self.for_expression(stmt.value)
+            self.push(Op.PRINT, temp)
+
+    def for_expression(self, root: Expression) -> int:
+        # Explicit post-order traversal: a 'visit' entry schedules the
+        # node's children before its own 'emit' entry, and emitted
+        # temporaries accumulate on a value stack.  This avoids one
+        # interpreter frame per AST node and keeps deeply nested
+        # expressions clear of the recursion limit.
+        work = [('visit', root)]
+        vals = []
+
+        while work:
+            action, node = work.pop()
+
+            if action == 'emit':
+                nargs = len(node.arguments)
+                arguments = vals[-nargs:]
+                del vals[-nargs:]
+                vals.append(self._op_app(node.operator, arguments))
+
+            elif isinstance(node, VarExpression):
+                vals.append(self._vars[node.name.value])
+
+            elif isinstance(node, IntExpression):
+                vals.append(self._const(node.value))
+
+            elif isinstance(node, OpAppExpression):
+                work.append(('emit', node))
+                for arg in reversed(node.arguments):
+                    work.append(('visit', arg))
+
+        return vals.pop()
+
+    def _op_app(self, operator: str, arguments: list[int]) -> int:
+        # Constant folding: when every operand holds a known constant,
+        # evaluate the application at compile time.
+        if all(a in self._values for a in arguments):
+            fold = FOLD.get(operator)
+            if fold is not None:
+                value = fold(*(self._values[a] for a in arguments))
+                if value is not None:
+                    return self._const(value)
+
+        # Common-subexpression elimination: temporaries are
+        # single-assignment (variables excepted, see _invalidate), so
+        # an application already computed from the same temporaries
+        # can be reused as is.
+        key = (operator, *arguments)
+        target = self._exprs.get(key)
+
+        if target is None:
+            target = self._exprs[key] = self.fresh_temporary()
+            self.push(OPCODES[operator], *arguments, result=target)
+
+        return target
 
-            case AssignStatement(lhs, rhs):
-                temp = self.for_expression(rhs)
-                self.push('copy', temp, result=self._vars[lhs.value])
+    def _const(self, value: int) -> int:
+        temp = self._consts.get(value)
 
-            case PrintStatement(value):
-                temp = self.for_expression(value)
-                self.push('print', temp)
+        if temp is None:
+            temp = self._consts[value] = self.fresh_temporary()
+            self._values[temp] = value
+            self.push(Op.CONST, str(value), result=temp)
 
-    def for_expression(self, expr: Expression) -> str:
-        target = None
+        return temp
 
-        match expr:
-            case VarExpression(name):
-                target = self._vars[name.value]
+    def _invalidate(self, temp: int):
+        # A variable's temporary was re-assigned: forget any cached
+        # application computed from it.
+        for key in [k for k in self._exprs if temp in k[1:]]:
+            del self._exprs[key]
 
-            case IntExpression(value):
-                target = self.fresh_temporary()
-                self.push('const', str(value), result=target)
+    def prune_dead_consts(self):
+        used = set()
 
-            case OpAppExpression(operator, arguments):
-                target = self.fresh_temporary()
-                arguments = [self.for_expression(e) for e in arguments]
-                self.push(OPCODES[operator], *arguments, result=target)
+        for tac in self._tac:
+            used.update(tac.args)
 
-        return target
+        # Folding can leave constants that no instruction reads
+        self._tac = [
+            tac for tac in self._tac
+            if tac.opcode is not Op.CONST or tac.result in used
+        ]
 
 
 # ====================================================================
@@ -373,6 +679,10 @@ def parse_args():
 
 
 def _main():
+    # The parser still recurses on nested parentheses and unary
+    # operators; the default limit is too low for generated sources.
+    sys.setrecursionlimit(100_000)
+
     args = parse_args()
 
     try:
@@ -388,21 +698,20 @@ def _main():
     if prgm is None:
         exit(1)
 
-    print(prgm)
-
     if not SynChecker.check(prgm):
         exit(1)
 
     tac = MM.mm(prgm)
 
-    aout = [dict(
-        proc='@main',
-        body=[x.tojson() for x in tac],
-    )]
+    aout = [dict(proc='@main', body=[tac_json(x) for x in tac])]
 
     try:
         with open(args.output, 'w') as stream:
-            json.dump(aout, stream, indent=2)
+            if orjson is not None:
+                stream.write(
+                    orjson.dumps(aout, option=orjson.OPT_INDENT_2).decode())
+            else:
+                json.dump(aout, stream, indent=2)
             print(file=stream)  # Add a new-line
 
     except IOError as e: